@@ -151,12 +151,17 @@ def R_Q_poly2(R: set[Reaction], F: set[str]) -> set[Reaction]:
     })}
 
 def R_Q_exp(R: set[Reaction], F: set[str]) -> set[Reaction]:
-    try:
-        return set.intersection(*all_rafs(R, F))
-    except:
-        return set()
+    from raf_components import persistent_reactions
+    return persistent_reactions(R, F)
 
-def all_rafs(R: set[Reaction], F: set[str]) -> set[set[Reaction]]:
+def all_rafs(R: set[Reaction], F: set[str]) -> list[set[Reaction]]:
+    """Enumerates all RAFs, combining the RAFs of each strongly connected
+       component of the reaction dependency graph (see raf_components).
+    """
+    from raf_components import all_rafs as decomposed_all_rafs
+    return decomposed_all_rafs(R, F)
+
+def all_rafs_flat(R: set[Reaction], F: set[str]) -> list[set[Reaction]]:
 
     def all_sub_rafs(R: set[Reaction], F: set[str]) -> set[set[Reaction]]:
         rafs = {frozenset(phi(R, F))}
@@ -0,0 +1,74 @@
+"""
+Strongly-connected-component decomposition of a CRS for RAF computations.
+
+Reaction r points to reaction s when r produces a non-food molecule that s uses
+as a reactant or catalyst. Whether a reaction can take part in a RAF depends
+only on reactions upstream of it in this graph, so after condensing the graph
+into SCCs the maxRAF, the set of all RAFs and the persistent reactions can be
+built one component at a time in topological order, each component seeing the
+closure of the reactions already chosen upstream as its food set.
+"""
+
+import igraph as ig
+from maxRAF import Reaction, closure, phi, all_rafs_flat
+
+
+def reaction_components(R: set[Reaction], F: set[str]) -> list[set[Reaction]]:
+    """ Returns the SCCs of the reaction dependency graph in topological order. """
+    reactions = list(R)
+    id_of = {r: i for i, r in enumerate(reactions)}
+
+    consumers = {}
+    for r in reactions:
+        for molecule in r.rho().union(*r.catalyst_sets) - F:
+            consumers.setdefault(molecule, []).append(id_of[r])
+
+    edges = set()
+    for r in reactions:
+        for molecule in r.pi() - F:
+            for j in consumers.get(molecule, []):
+                edges.add((id_of[r], j))
+
+    g = ig.Graph(n=len(reactions), edges=list(edges), directed=True)
+    clusters = g.connected_components(mode="strong")
+    order = clusters.cluster_graph().topological_sorting(mode="out")
+    return [{reactions[i] for i in clusters[c]} for c in order]
+
+def decomposed_phi(R: set[Reaction], F: set[str]) -> set[Reaction]:
+    """ maxRAF computed component by component; agrees with maxRAF.phi. """
+    max_raf = set()
+    food = set(F)
+    for component in reaction_components(R, F):
+        component_raf = phi(component, food)
+        if component_raf:
+            max_raf.update(component_raf)
+            food = closure(component_raf, food)
+    return max_raf
+
+def all_rafs(R: set[Reaction], F: set[str]) -> list[set[Reaction]]:
+    """ Enumerates every RAF by extending the RAFs of the upstream components with
+        either nothing or a RAF of the next component (relative to the upstream closure).
+    """
+    partial_rafs = [(frozenset(), frozenset(F))]
+    for component in reaction_components(decomposed_phi(R, F), F):
+        extended = []
+        for raf, food in partial_rafs:
+            extended.append((raf, food))
+            for component_raf in all_rafs_flat(component, food):
+                extended.append((raf | component_raf, frozenset(closure(component_raf, food))))
+        partial_rafs = extended
+    return [set(raf) for raf, _ in partial_rafs if raf]
+
+def persistent_reactions(R: set[Reaction], F: set[str]) -> set[Reaction]:
+    """ Reactions contained in every RAF. A component can only hold such reactions if
+        every RAF uses it, and then they are the reactions common to all of its RAFs
+        relative to the closure of the maxRAF upstream of it.
+    """
+    max_raf = decomposed_phi(R, F)
+    persistent = set()
+    food = set(F)
+    for component in reaction_components(max_raf, F):
+        if decomposed_phi(max_raf - component, F) == set():
+            persistent.update(set.intersection(*all_rafs_flat(component, food)))
+        food = closure(component, food)
+    return persistent
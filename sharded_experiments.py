@@ -0,0 +1,232 @@
+"""
+Deterministic sharding of the binary polymer model Monte Carlo sweeps.
+
+An ExperimentSpec fixes the (n, mc, sample) grid and a seed. Every grid point
+draws its catalysis from its own counter-based Philox stream keyed by the seed
+and counted by (n, mc index, sample index), so a sample's result does not
+depend on which machine computes it or in which order. run_shard computes the
+grid points u with u % shard_count == shard_index and writes their integer sums
+to a small JSON file; merge_shards adds the files back up into the same curves
+a single shard_count=1 run would give, reporting missing and duplicated shards.
+"""
+
+import glob
+import hashlib
+import itertools
+import json
+import os
+from typing import NamedTuple
+import numpy as np
+from maxRAF import Reaction
+from sparse_raf import SparseCRS
+
+MEASURES = ["raf", "raf_size", "caf", "caf_size", "praf_size"]
+
+
+class ExperimentSpec(NamedTuple):
+    n_range: list[int]
+    mc_span: list[float]
+    sample_size: int
+    seed: int = 0
+    t: int = 2
+    l: int = 2
+    allow_food_catalyst: bool = True
+
+    def fingerprint(self) -> str:
+        return hashlib.sha256(json.dumps(make_spec(*self)._asdict(), sort_keys=True).encode()).hexdigest()
+
+
+class MergeResult(NamedTuple):
+    spec: ExperimentSpec
+    curves: dict[int, dict[str, list[float]]]
+    missing: list[int]
+    duplicated: list[int]
+
+
+def save_spec(spec: ExperimentSpec, filename: str) -> None:
+    with open(filename, 'w') as f:
+        json.dump(make_spec(*spec)._asdict(), f, indent=2)
+
+def load_spec(filename: str) -> ExperimentSpec:
+    with open(filename, 'r') as f:
+        return ExperimentSpec(**json.load(f))
+
+def make_spec(n_range, mc_span, sample_size, seed=0, t=2, l=2, allow_food_catalyst=True) -> ExperimentSpec:
+    """ Builds a spec of plain Python values, e.g. from np.linspace output, so it can be
+        serialized and fingerprinted.
+    """
+    return ExperimentSpec([int(n) for n in n_range], [float(mc) for mc in mc_span], int(sample_size),
+                          int(seed), int(t), int(l), bool(allow_food_catalyst))
+
+def shard_filename(directory: str, shard_index: int, shard_count: int) -> str:
+    return os.path.join(directory, f"shard-{shard_index:05d}-of-{shard_count:05d}.json")
+
+def sample_rng(spec: ExperimentSpec, n: int, mc_index: int, sample_index: int) -> np.random.Generator:
+    """ Independent stream for one grid point; the low counter word is left for the draws. """
+    return np.random.Generator(np.random.Philox(key=spec.seed, counter=[0, sample_index, mc_index, n]))
+
+
+class _CanonicalNetwork:
+    """ Binary polymer network of size n with reactions and candidate catalysts in a fixed
+        order, since set iteration order (and so the generator's labels) varies between processes.
+        Holds the same reactions as BinaryCRSGenerator.generate_reactions, every concatenation
+        a + b -> ab and cut ab -> a + b with |ab| <= n, built directly in linear time.
+    """
+    def __init__(self, spec: ExperimentSpec, n: int):
+        alphabet = ['0','1','2','3','4','5','6','7','8','9'][:spec.l]
+        elements = [''.join(p) for k in range(1, n + 1) for p in itertools.product(alphabet, repeat=k)]
+        self.food_set = {element for element in elements if len(element) <= spec.t}
+
+        reactions = []
+        for c in elements:
+            for k in range(1, len(c)):
+                reactions.append(([c[:k], c[k:]], [c])) #concat
+                reactions.append(([c], [c[:k], c[k:]])) #cutting
+        reactions.sort()
+        self.reactions = [Reaction(f"r{i}", reactants, [], products) for i, (reactants, products) in enumerate(reactions)]
+        self.crs = SparseCRS(self.reactions, self.food_set)
+        catalysts = sorted(e for e in elements if spec.allow_food_catalyst or e not in self.food_set)
+        self.catalyst_index = np.array([self.crs.index_of[c] for c in catalysts], dtype=np.int32)
+
+    def catalyze(self, mc: float, rng: np.random.Generator) -> None:
+        """ Same distribution as BinaryCRSGenerator.catalyze_reactions_level_of_catalysis:
+            each candidate catalyses each reaction independently with p = mc / |R|.
+            Only the catalyst matrices of the compiled network are replaced.
+        """
+        p = min(mc / len(self.reactions), 1.0)
+        n_catalysts = len(self.catalyst_index)
+        counts = rng.binomial(n_catalysts, p, size=len(self.reactions))
+        chosen = [np.sort(rng.choice(n_catalysts, size=counts[i], replace=False)) for i in np.flatnonzero(counts)]
+        molecules = self.catalyst_index[np.concatenate(chosen)] if chosen else np.zeros(0, dtype=np.int32)
+        self.crs.set_single_catalysts(counts, molecules)
+
+    def measure(self) -> list[int]:
+        crs = self.crs
+        raf_size = int(crs.phi_mask().sum())
+        caf_size = int(crs.max_caf_mask().sum())
+        praf_size = int(crs.max_pseudo_raf_mask().sum())
+        return [int(raf_size > 0), raf_size, int(caf_size > 0), caf_size, praf_size]
+
+
+def _compute_shard(spec: ExperimentSpec, shard_index: int, shard_count: int, verbose: bool) -> dict:
+    number_of_points = len(spec.mc_span)
+    results = {}
+    for n_index, n in enumerate(spec.n_range):
+        network = None
+        sums = np.zeros((len(MEASURES), number_of_points), dtype=np.int64)
+        counts = np.zeros(number_of_points, dtype=np.int64)
+        for i, mc in enumerate(spec.mc_span):
+            first_unit = (n_index * number_of_points + i) * spec.sample_size
+            first_sample = (shard_index - first_unit) % shard_count
+            if first_sample >= spec.sample_size: continue
+            if verbose:
+                print(f"shard {shard_index}/{shard_count}, n = {n}: Processing mc index={i} out of {number_of_points}", end='\r')
+            for j in range(first_sample, spec.sample_size, shard_count):
+                if network is None: network = _CanonicalNetwork(spec, n)
+                network.catalyze(mc, sample_rng(spec, n, i, j))
+                sums[:, i] += network.measure()
+                counts[i] += 1
+        results[str(n)] = {"count": counts.tolist(), **{m: sums[k].tolist() for k, m in enumerate(MEASURES)}}
+    return results
+
+def run_shard(spec: ExperimentSpec, shard_index: int, shard_count: int, directory: str, verbose: bool = True) -> str:
+    """ Computes this shard's slice of the grid and writes it to directory. Returns the file name. """
+    spec = make_spec(*spec)
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index {shard_index} out of range for shard_count {shard_count}")
+    fingerprint = spec.fingerprint()
+
+    os.makedirs(directory, exist_ok=True)
+    filename = shard_filename(directory, shard_index, shard_count)
+    temporary = filename + ".tmp"
+    open(temporary, 'w').close()  # fail on an unwritable directory before any compute
+    try:
+        partial = {
+            "spec": spec._asdict(),
+            "fingerprint": fingerprint,
+            "shard_index": shard_index,
+            "shard_count": shard_count,
+            "results": _compute_shard(spec, shard_index, shard_count, verbose),
+        }
+        with open(temporary, 'w') as f:
+            json.dump(partial, f, separators=(',', ':'))
+        os.replace(temporary, filename)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return filename
+
+def merge_shards(directory: str) -> MergeResult:
+    """ Adds up the partial files in directory. Curves hold the mean of each measure per
+        (n, mc) point over the samples present; points with no samples are nan.
+    """
+    partials = []
+    for filename in sorted(glob.glob(os.path.join(directory, "shard-*-of-*.json"))):
+        with open(filename, 'r') as f:
+            partials.append(json.load(f))
+    if not partials:
+        raise ValueError(f"No shard files found in {directory}")
+
+    spec = ExperimentSpec(**partials[0]["spec"])
+    shard_count = partials[0]["shard_count"]
+    for partial in partials:
+        if partial["fingerprint"] != spec.fingerprint() or partial["shard_count"] != shard_count:
+            raise ValueError(f"Shard {partial['shard_index']} belongs to a different experiment or sharding")
+
+    seen, duplicated = set(), []
+    totals = {str(n): {key: np.zeros(len(spec.mc_span), dtype=np.int64) for key in ["count"] + MEASURES}
+              for n in spec.n_range}
+    for partial in partials:
+        if partial["shard_index"] in seen:
+            duplicated.append(partial["shard_index"])
+            continue
+        seen.add(partial["shard_index"])
+        for n, values in partial["results"].items():
+            for key, column in values.items():
+                totals[n][key] += np.array(column, dtype=np.int64)
+
+    curves = {}
+    for n in spec.n_range:
+        count = totals[str(n)]["count"]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            curves[n] = {m: (totals[str(n)][m] / count).tolist() for m in MEASURES}
+    missing = sorted(set(range(shard_count)) - seen)
+    return MergeResult(spec, curves, missing, sorted(duplicated))
+
+def _run_shard_args(args):
+    return run_shard(*args)
+
+def run_local(spec: ExperimentSpec, shard_count: int, directory: str, processes: int = None) -> MergeResult:
+    """ Stand-in for a multi-machine run: one process per shard, sharing only the directory. """
+    from multiprocessing import Pool
+    with Pool(processes) as pool:
+        pool.map(_run_shard_args, [(make_spec(*spec), k, shard_count, directory, False) for k in range(shard_count)])
+    return merge_shards(directory)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sharded binary polymer model sweeps")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="compute one shard")
+    run.add_argument("spec")
+    run.add_argument("shard_index", type=int)
+    run.add_argument("shard_count", type=int)
+    run.add_argument("directory")
+    local = commands.add_parser("local", help="compute all shards on this machine")
+    local.add_argument("spec")
+    local.add_argument("shard_count", type=int)
+    local.add_argument("directory")
+    merge = commands.add_parser("merge", help="merge the shard files in a directory")
+    merge.add_argument("directory")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        print(run_shard(load_spec(args.spec), args.shard_index, args.shard_count, args.directory))
+    else:
+        result = run_local(load_spec(args.spec), args.shard_count, args.directory) \
+            if args.command == "local" else merge_shards(args.directory)
+        print(f"missing shards: {result.missing}, duplicated shards: {result.duplicated}")
+        for n, curve in result.curves.items():
+            print(f"n = {n}: P(RAF) = {curve['raf']}")
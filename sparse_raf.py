@@ -0,0 +1,173 @@
+"""
+Sparse-matrix backend for closure, maxRAF, maxCAF and max-pRAF computations.
+
+A CRS is compiled once into CSR incidence matrices (reactions x molecules for
+reactants and products, catalyst sets x molecules for catalysis) so that every
+step of the closure / phi fixpoints is a handful of sparse mat-vec products
+instead of per-reaction Python work. Results agree with maxRAF.closure and
+maxRAF.phi. The same compiled network also gives the maxCAF (forward
+constructive fixpoint from the food set) and the maximal pseudo-RAF.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from maxRAF import Reaction
+
+
+def _incidence(rows: list[set[int]], n_cols: int) -> sp.csr_matrix:
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(row) for row in rows])
+    indices = np.fromiter((j for row in rows for j in sorted(row)), dtype=np.int32, count=indptr[-1])
+    data = np.ones(len(indices), dtype=np.int32)
+    return sp.csr_matrix((data, indices, indptr), shape=(len(rows), n_cols))
+
+
+class SparseCRS:
+    def __init__(self, reactions: set[Reaction], food_set: set[str]):
+        self.reactions = list(reactions)
+
+        molecules = set(food_set)
+        for r in self.reactions:
+            molecules.update(r.reactants, r.products, *r.catalyst_sets)
+        self.molecules = sorted(molecules)
+        self.index_of = {m: i for i, m in enumerate(self.molecules)}
+        n_molecules = len(self.molecules)
+
+        reactant_rows = [{self.index_of[m] for m in r.reactants} for r in self.reactions]
+        product_rows = [{self.index_of[m] for m in r.products} for r in self.reactions]
+        catalyst_rows = [{self.index_of[m] for m in U} for r in self.reactions for U in r.catalyst_sets]
+        owner_rows = []
+        k = 0
+        for r in self.reactions:
+            owner_rows.append(set(range(k, k + len(r.catalyst_sets))))
+            k += len(r.catalyst_sets)
+
+        self.reactants = _incidence(reactant_rows, n_molecules)
+        self.reactant_counts = np.array([len(row) for row in reactant_rows], dtype=np.int32)
+        self.products_T = _incidence(product_rows, n_molecules).T.tocsr()
+        self.catalysts = _incidence(catalyst_rows, n_molecules)
+        self.catalyst_sizes = np.array([len(row) for row in catalyst_rows], dtype=np.int32)
+        self.catalyst_owner = _incidence(owner_rows, len(catalyst_rows))
+
+        self.food = np.zeros(n_molecules, dtype=bool)
+        self.food[[self.index_of[f] for f in food_set]] = True
+
+    def set_single_catalysts(self, counts: np.ndarray, molecules: np.ndarray) -> None:
+        """ Replaces the catalysis with single-molecule catalyst sets, keeping the compiled
+            reactant and product structure: reaction i is catalysed by the next counts[i]
+            molecule indices of molecules. The Reaction objects are left unchanged.
+        """
+        k = len(molecules)
+        ones = np.ones(k, dtype=np.int32)
+        self.catalysts = sp.csr_matrix((ones, np.asarray(molecules, dtype=np.int32), np.arange(k + 1)),
+                                       shape=(k, len(self.molecules)))
+        self.catalyst_sizes = ones
+        owner_indptr = np.zeros(len(self.reactions) + 1, dtype=np.int64)
+        owner_indptr[1:] = np.cumsum(counts)
+        self.catalyst_owner = sp.csr_matrix((ones, np.arange(k, dtype=np.int32), owner_indptr),
+                                            shape=(len(self.reactions), k))
+
+    def _all_reactions(self) -> np.ndarray:
+        return np.ones(len(self.reactions), dtype=bool)
+
+    def _supported(self, available: np.ndarray) -> np.ndarray:
+        """ Reactions whose reactants are all in the available molecules. """
+        return self.reactants @ available.astype(np.int32) == self.reactant_counts
+
+    def _catalysed(self, available: np.ndarray) -> np.ndarray:
+        """ Reactions with at least one catalyst set inside the available molecules. """
+        satisfied_sets = self.catalysts @ available.astype(np.int32) == self.catalyst_sizes
+        return self.catalyst_owner @ satisfied_sets.astype(np.int32) > 0
+
+    def _produced(self, active: np.ndarray) -> np.ndarray:
+        return self.products_T @ active.astype(np.int32) > 0
+
+    def closure_vector(self, active: np.ndarray = None) -> np.ndarray:
+        """ Boolean molecule vector of the closure of the active reactions under the food set. """
+        if active is None: active = self._all_reactions()
+        available = self.food.copy()
+        while True:
+            updated = available | self._produced(active & self._supported(available))
+            if np.array_equal(updated, available): return available
+            available = updated
+
+    def phi_mask(self, active: np.ndarray = None) -> np.ndarray:
+        """ Boolean reaction mask of the maxRAF of the active reactions. """
+        Rk = self._all_reactions() if active is None else active.copy()
+        while Rk.any():
+            closure_Rk = self.closure_vector(Rk)
+            Rk_plus_one = Rk & self._supported(closure_Rk) & self._catalysed(closure_Rk)
+            if np.array_equal(Rk, Rk_plus_one): break
+            Rk = Rk_plus_one
+        return Rk
+
+    def max_caf_mask(self) -> np.ndarray:
+        """ Boolean reaction mask of the maxCAF: reactions that fire when molecules are only
+            ever produced by reactions whose reactants and a catalyst set are already present.
+        """
+        available = self.food.copy()
+        fired = np.zeros(len(self.reactions), dtype=bool)
+        while True:
+            fired_next = self._supported(available) & self._catalysed(available)
+            if np.array_equal(fired_next, fired): return fired
+            fired = fired_next
+            available = available | self._produced(fired)
+
+    def max_pseudo_raf_mask(self) -> np.ndarray:
+        """ Boolean reaction mask of the maximal pseudo-RAF: reactants and a catalyst set of
+            every reaction lie in F together with the products of the set (no closure required).
+        """
+        Rk = self._all_reactions()
+        while Rk.any():
+            available = self.food | self._produced(Rk)
+            Rk_plus_one = Rk & self._supported(available) & self._catalysed(available)
+            if np.array_equal(Rk, Rk_plus_one): break
+            Rk = Rk_plus_one
+        return Rk
+
+    def molecules_of(self, available: np.ndarray) -> set[str]:
+        return {self.molecules[i] for i in np.flatnonzero(available)}
+
+    def reactions_of(self, mask: np.ndarray) -> set[Reaction]:
+        return {self.reactions[i] for i in np.flatnonzero(mask)}
+
+    def closure(self) -> set[str]:
+        return self.molecules_of(self.closure_vector())
+
+    def phi(self) -> set[Reaction]:
+        return self.reactions_of(self.phi_mask())
+
+    def max_caf(self) -> set[Reaction]:
+        return self.reactions_of(self.max_caf_mask())
+
+    def max_pseudo_raf(self) -> set[Reaction]:
+        return self.reactions_of(self.max_pseudo_raf_mask())
+
+
+def closure(reactions: set[Reaction], food_set: set[str]) -> set[str]:
+    """ Sparse equivalent of maxRAF.closure. """
+    return SparseCRS(reactions, food_set).closure()
+
+def phi(R: set[Reaction], F: set[str]) -> set[Reaction]:
+    """ Sparse equivalent of maxRAF.phi. """
+    return SparseCRS(R, F).phi()
+
+def max_caf(R: set[Reaction], F: set[str]) -> set[Reaction]:
+    return SparseCRS(R, F).max_caf()
+
+def max_pseudo_raf(R: set[Reaction], F: set[str]) -> set[Reaction]:
+    return SparseCRS(R, F).max_pseudo_raf()
+
+
+if __name__ == "__main__":
+    import maxRAF
+
+    for name in ["example_0", "example_1", "example_9", "example_custom_0",
+                 "example_custom_1", "example_custom_2", "example_custom_3"]:
+        example = getattr(maxRAF, name)
+        reactions, food_set = example["reaction_set"], example["food_set"]
+        assert phi(reactions, food_set) == maxRAF.phi(reactions, food_set)
+        assert closure(reactions, food_set) == maxRAF.closure(reactions, food_set)
+        crs = SparseCRS(reactions, food_set)
+        print(f"{name}: maxCAF size {len(crs.max_caf())}, maxRAF size {len(crs.phi())}, "
+              f"max-pRAF size {len(crs.max_pseudo_raf())}")